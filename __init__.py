@@ -4,8 +4,18 @@ Adds a Downloader button to ComfyUI interface with modal UI
 """
 
 import os
+import re
+import queue
+import json
+import time
+import hashlib
 import logging
 import asyncio
+import threading
+import concurrent.futures
+from array import array
+from pathlib import Path
+import aiohttp
 import folder_paths
 from aiohttp import web
 from server import PromptServer
@@ -14,19 +24,241 @@ from server import PromptServer
 active_downloads = {}
 # Download control (for pause/resume)
 download_control = {}
-# Download queue management
-download_queue = []
-current_download_task = None  # Only one download at a time
+# Download queue management - a single worker consumes it, so only one download runs at a time
+download_queue = asyncio.Queue()
+download_worker_task = None
 
 # Configuration optimized for datacenter connections
-CHUNK_SIZE = 32 * 1024 * 1024  # 32MB chunks - balanced for 500MB to 30GB+ files
+SLICE_SIZE = 64 * 1024 * 1024  # 64MB range requests - one connection per slice of the file, up to NUM_CONNECTIONS
 NUM_CONNECTIONS = 8  # 8 parallel connections - optimal for DC bandwidth
+MAX_SLICE_RETRIES = 3  # Attempts per slice before the download fails
+RANGES_SAVE_INTERVAL = 4  # Persist completed slices to the .ranges sidecar every N slices
+WRITE_BUFFER_SIZE = 1024 * 1024  # 1MB - socket reads are coalesced into one disk write per buffer
+
+# Stall detection clock - immune to wall-clock jumps
+_monotonic = time.monotonic
+
+# Rejects path traversal in a normalized (forward-slash) filename: any "..", or absolute/home paths
+_BAD_FILENAME = re.compile(r"\.\.|^[/~]")
+
+# Content-Range of a partial response: "bytes start-end/total", total is "*" when unknown
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
 
 API_PREFIX = "35b631e00fa2dbc173ee4a5f899cba8f"
 
+# Positional writes on a single shared fd - os.pwrite is not available on Windows,
+# so fall back to lseek + write guarded by a lock
+if hasattr(os, "pwrite"):
+    _pwrite = os.pwrite
+else:
+    _pwrite_lock = threading.Lock()
+
+    def _pwrite(fd, data, offset):
+        with _pwrite_lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            return os.write(fd, data)
+
+
+def write_at(fd, data, offset):
+    """Write all of data to fd at offset, retrying on short writes"""
+    view = memoryview(data)
+    while view:
+        written = _pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+def preallocate(fd, size):
+    """Size the file, reserving real extents up front where supported"""
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        os.ftruncate(fd, size)
+
+
+# Disk writes run here so a slow write never stalls the event loop (progress, pause/cancel checks)
+_io_executor = concurrent.futures.ThreadPoolExecutor(max_workers=NUM_CONNECTIONS, thread_name_prefix="ComfyUI-Downloader-io")
+
+
+async def write_at_async(fd, data, offset):
+    """Write all of data to fd at offset on the IO thread pool"""
+    await asyncio.get_running_loop().run_in_executor(_io_executor, write_at, fd, data, offset)
+
+
+# Reusable write buffers, one per active connection - filled lazily, kept for the next download
+_buffer_pool = queue.LifoQueue()
+
+
+def acquire_buffer():
+    """Take a write buffer from the pool, allocating one if none is free"""
+    try:
+        return _buffer_pool.get_nowait()
+    except queue.Empty:
+        return bytearray(WRITE_BUFFER_SIZE)
+
+
+def release_buffer(buf):
+    """Return a write buffer to the pool"""
+    _buffer_pool.put_nowait(buf)
+
+
+async def flush_buffer(fd, buf, filled, offset):
+    """Write the first filled bytes of buf at offset, returning the next offset"""
+    if filled:
+        await write_at_async(fd, memoryview(buf)[:filled], offset)
+    return offset + filled
+
+
+async def buffered_write(fd, buf, filled, offset, chunk):
+    """Append chunk to buf, writing the buffer out when full. Returns the new (filled, offset)"""
+    chunk_len = len(chunk)
+    if filled + chunk_len > len(buf):
+        offset = await flush_buffer(fd, buf, filled, offset)
+        filled = 0
+
+    # Chunks larger than the buffer go straight to disk
+    if chunk_len > len(buf):
+        await write_at_async(fd, chunk, offset)
+        return filled, offset + chunk_len
+
+    buf[filled:filled + chunk_len] = chunk
+    return filled + chunk_len, offset
+
+
+def parse_content_range(value):
+    """Parse a Content-Range header into (start, end, total), total None if unknown, or None if invalid"""
+    match = _CONTENT_RANGE.fullmatch(value.strip())
+    if match is None:
+        return None
+    start, end, total = match.groups()
+    return int(start), int(end), None if total == "*" else int(total)
+
+
+def ranges_path(output_path):
+    """Sidecar file listing the completed slices of a partial download"""
+    return output_path + ".ranges"
+
+
+def url_hash(url):
+    """Identify a download URL in the sidecar without storing it - URLs can carry access tokens"""
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def read_ranges_sidecar(output_path):
+    """Read the completed slices sidecar, or None if missing or unreadable"""
+    try:
+        with open(ranges_path(output_path), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except (OSError, ValueError):
+        return None
+
+
+def load_completed_ranges(output_path, url, total_size):
+    """Read completed slices of an interrupted download, or an empty set if it can't be resumed"""
+    data = read_ranges_sidecar(output_path)
+    try:
+        # Only trust the sidecar if it belongs to this exact file
+        if data is None or data.get("url_hash") != url_hash(url) or data.get("total") != total_size:
+            return set()
+        if os.path.getsize(output_path) != total_size:
+            return set()
+        return {(start, end) for start, end in data.get("ranges", [])}
+    except (OSError, ValueError, TypeError):
+        return set()
+
+
+def save_completed_ranges(output_path, url, total_size, ranges):
+    """Atomically write the completed slices sidecar"""
+    path = ranges_path(output_path)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"url_hash": url_hash(url), "total": total_size, "ranges": sorted(ranges)}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+# fdatasync skips the metadata flush but is not available everywhere (macOS, Windows)
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+
+def remove_completed_ranges(output_path):
+    """Delete the completed slices sidecar if present"""
+    try:
+        os.remove(ranges_path(output_path))
+    except FileNotFoundError:
+        pass
+
+
+async def flush_completed_ranges(control, fd, output_path, url, total_size):
+    """Persist the completed slices of a download on the IO thread pool"""
+    loop = asyncio.get_running_loop()
+    async with control["ranges_lock"]:
+        ranges = list(control["completed_ranges"])
+        # The slices must be on disk before the sidecar claims them, or a power loss
+        # leaves pre-allocated zeros marked as downloaded
+        await loop.run_in_executor(_io_executor, _fdatasync, fd)
+        await loop.run_in_executor(
+            _io_executor, save_completed_ranges, output_path, url, total_size, ranges
+        )
+    # Waiting on the lock and the data sync is disk time, not a network stall
+    control["last_progress_time"] = _monotonic()
+
+
+# Shared HTTP session - pools TLS/TCP connections and DNS lookups across queued downloads
+_session = None
+
+
+async def get_session():
+    """Get the shared aiohttp session, creating it on first use"""
+    global _session
+
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=NUM_CONNECTIONS * 4,
+            limit_per_host=NUM_CONNECTIONS * 4,
+            ttl_dns_cache=300,
+            keepalive_timeout=75
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=None))
+    return _session
+
+
+async def close_session(app):
+    """Close the shared aiohttp session on server shutdown"""
+    global _session
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+PromptServer.instance.app.on_cleanup.append(close_session)
+
+
 # Save the original function before wrapping
 original_get_filename_list = folder_paths.get_filename_list
 
+# Download targets (paths containing /models/) per folder, rebuilt only when that folder's paths change
+_model_paths_cache = {}
+
+
+def _model_paths(folder_name):
+    """Get the paths containing /models/ configured for a folder, or an empty list"""
+    entry = folder_paths.folder_names_and_paths.get(folder_name)
+    if entry is None:
+        return []
+
+    # Keyed on the path contents - ComfyUI edits path lists in place (e.g. reordering defaults)
+    paths = entry[0]
+    key = tuple(paths)
+    cached = _model_paths_cache.get(folder_name)
+    if cached is None or cached[0] != key:
+        cached = (key, [path for path in paths if "/models/" in path])
+        _model_paths_cache[folder_name] = cached
+    return cached[1]
+
+
 # Wrapper for folder_paths.get_filename_list
 def get_filename_list_wrapper(folder_name):
     """Wrapper for folder_paths.get_filename_list to get list of files in a folder"""
@@ -35,14 +267,12 @@ def get_filename_list_wrapper(folder_name):
         result = original_get_filename_list(folder_name)
         # Prepend folder path entry for download directory
         mapped_folder = folder_paths.map_legacy(folder_name)
-        if mapped_folder in folder_paths.folder_names_and_paths:
-            paths, _ = folder_paths.folder_names_and_paths[mapped_folder]
-            if paths and any("/models/" in path for path in paths):  # Check if paths list is not empty and contains /models/
-                folder_entry = "__folder__path__" + folder_name
-                if not result:
-                    result = [folder_entry]
-                else:
-                    result = [folder_entry] + result
+        if _model_paths(mapped_folder):
+            folder_entry = "__folder__path__" + folder_name
+            if not result:
+                result = [folder_entry]
+            else:
+                result = [folder_entry] + result
         return result
     except Exception as e:
         logging.error(f"[ComfyUI-Downloader] Error getting file list for {folder_name}: {e}")
@@ -72,19 +302,12 @@ async def start_download(request):
         safe_filename = os.path.normpath(filename).replace("\\", "/")
         
         # Validate filename to prevent path traversal attacks
-        if ".." in safe_filename or safe_filename.startswith("/") or safe_filename.startswith("~"):
+        if _BAD_FILENAME.search(safe_filename):
             return web.json_response(
                 {"error": "Invalid filename: path traversal patterns detected"},
                 status=400
             )
 
-        # Ensure it doesn't try to escape the directory
-        if safe_filename.startswith("../") or "/../" in safe_filename:
-            return web.json_response(
-                {"error": "Invalid filename: path traversal detected"},
-                status=400
-            )
-
         # Get the first path for this folder type from folder_paths
         mapped_folder = folder_paths.map_legacy(save_path)
         if mapped_folder not in folder_paths.folder_names_and_paths:
@@ -100,8 +323,8 @@ async def start_download(request):
                 status=400
             )
 
-        # Filter paths to only include those containing /models/
-        model_paths = [path for path in paths if "/models/" in path]
+        # Only paths containing /models/ are valid download targets
+        model_paths = _model_paths(mapped_folder)
         if not model_paths:
             return web.json_response(
                 {"error": f"No valid model paths (containing /models/) configured for {save_path}"},
@@ -109,20 +332,33 @@ async def start_download(request):
             )
 
         # Use the first path from the configured paths
-        output_dir = model_paths[0]
-        output_path = os.path.join(output_dir, safe_filename)
+        output_dir = Path(model_paths[0]).resolve()
+        target = (output_dir / safe_filename).resolve()
 
-        # Final security check: ensure the resolved path is within the configured directory
-        output_path = os.path.abspath(output_path)
-        output_dir = os.path.abspath(output_dir)
-        if not output_path.startswith(output_dir + os.sep):
+        # Final security check: ensure the resolved path (symlinks included) is within the configured directory
+        if target == output_dir or not target.is_relative_to(output_dir):
             return web.json_response(
                 {"error": "Security error: attempted directory escape"},
                 status=400
             )
+        output_path = str(target)
+
+        # Use SHA256 hash for unique, URL-safe download_id
+        download_id = hashlib.sha256(f"{save_path}/{safe_filename}".encode()).hexdigest()
+
+        # Don't touch a file that is still queued or being downloaded
+        existing = active_downloads.get(download_id)
+        if existing is not None and existing["status"] in ("queued", "downloading"):
+            return web.json_response(
+                {"error": f"Download already in progress: {safe_filename}"},
+                status=409
+            )
 
-        # Check if file already exists
-        if os.path.exists(output_path):
+        # Check if file already exists - a leftover .ranges sidecar from the same URL means an
+        # interrupted download that will be resumed, so don't ask to override it
+        sidecar = read_ranges_sidecar(output_path)
+        resumable = not override and sidecar is not None and sidecar.get("url_hash") == url_hash(url)
+        if os.path.exists(output_path) and not resumable:
             if not override:
                 # Request confirmation from user
                 return web.json_response({
@@ -131,10 +367,11 @@ async def start_download(request):
                     "path": output_path
                 })
             else:
-                # User confirmed override, remove existing file
+                # User confirmed override, remove existing file (and any partial download state)
                 logging.info(f"[ComfyUI-Downloader] Overriding existing file: {output_path}")
                 try:
                     os.remove(output_path)
+                    remove_completed_ranges(output_path)
                 except Exception as e:
                     return web.json_response(
                         {"error": f"Failed to remove existing file: {str(e)}"},
@@ -144,10 +381,8 @@ async def start_download(request):
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-        # Mark as queued - use SHA256 hash for unique, URL-safe download_id
-        import hashlib
-        download_id = hashlib.sha256(f"{save_path}/{safe_filename}".encode()).hexdigest()
-        active_downloads[download_id] = {
+        # Mark as queued
+        state = {
             "url": url,
             "filename": safe_filename,
             "save_path": save_path,
@@ -156,17 +391,18 @@ async def start_download(request):
             "status": "queued",
             "priority": None
         }
+        active_downloads[download_id] = state
 
-        # Add to queue
-        download_queue.append({
+        # Add to queue (worker starts the download once earlier ones finish).
+        # The state dict identifies this enqueue - a cancel + re-queue of the same file replaces it
+        ensure_download_worker()
+        await download_queue.put({
             "download_id": download_id,
+            "state": state,
             "url": url,
             "output_path": output_path
         })
 
-        # Process queue (will start download if slot available)
-        asyncio.create_task(process_download_queue())
-
         return web.json_response({
             "success": True,
             "download_id": download_id,
@@ -181,316 +417,379 @@ async def start_download(request):
         )
 
 
-async def process_download_queue():
-    """Process the download queue - one download at a time"""
-    global download_queue, current_download_task
-
-    # Check if already downloading
-    if current_download_task is not None and not current_download_task.done():
-        logging.info("[ComfyUI-Downloader] Download already in progress, waiting...")
-        return  # Already downloading
-
-    if len(download_queue) == 0:
-        logging.info("[ComfyUI-Downloader] Queue is empty")
-        return  # Nothing to process
-
-    # Get next download from queue
-    download_item = download_queue.pop(0)
-    download_id = download_item["download_id"]
-    url = download_item["url"]
-    output_path = download_item["output_path"]
-
-    # Set status to downloading
-    active_downloads[download_id]["status"] = "downloading"
-    active_downloads[download_id]["progress"] = 0
-    active_downloads[download_id]["downloaded"] = 0
-
-    logging.info(f"[ComfyUI-Downloader] Starting download {download_id} with {NUM_CONNECTIONS} connections")
-
-    # Notify frontend that download is starting
-    await PromptServer.instance.send("server_download_progress", {
-        "download_id": download_id,
-        "progress": 0,
-        "downloaded": 0,
-        "total": 0
-    })
-
-    # Start download task
-    current_download_task = asyncio.create_task(download_file(url, output_path, download_id))
-
-    # Add completion callback to process next in queue
-    current_download_task.add_done_callback(lambda t: on_download_complete(download_id))
-
-
-def on_download_complete(download_id):
-    """Called when a download completes - processes next in queue"""
-    global current_download_task
-
-    current_download_task = None
-    logging.info(f"[ComfyUI-Downloader] Download completed: {download_id}, processing next in queue...")
+def ensure_download_worker():
+    """Start the download queue worker if it isn't running yet"""
+    global download_worker_task
 
-    # Process next in queue
-    asyncio.create_task(process_download_queue())
+    if download_worker_task is None or download_worker_task.done():
+        download_worker_task = asyncio.create_task(process_download_queue())
 
 
-async def download_chunk(session, url, start, end, output_path, chunk_index, download_id):
-    """Download a specific chunk of the file"""
-    headers = {'Range': f'bytes={start}-{end}'}
-
-    try:
-        async with session.get(url, headers=headers) as response:
-            if response.status not in [200, 206]:
-                return None
+async def process_download_queue():
+    """Process the download queue - one download at a time"""
+    while True:
+        download_item = await download_queue.get()
+        try:
+            download_id = download_item["download_id"]
+            url = download_item["url"]
+            output_path = download_item["output_path"]
+
+            # Skip downloads cancelled, re-queued or already handled while waiting in the queue
+            state = active_downloads.get(download_id)
+            if state is not download_item["state"] or state["status"] != "queued":
+                logging.info(f"[ComfyUI-Downloader] Skipping {download_id}, no longer queued")
+                continue
+
+            # Set status to downloading
+            active_downloads[download_id]["status"] = "downloading"
+            active_downloads[download_id]["progress"] = 0
+            active_downloads[download_id]["downloaded"] = 0
 
-            chunk_data = await response.read()
+            logging.info(f"[ComfyUI-Downloader] Starting download {download_id} with {NUM_CONNECTIONS} connections")
 
-            # Write chunk to file at specific position
-            with open(output_path, 'r+b') as f:
-                f.seek(start)
-                f.write(chunk_data)
+            # Notify frontend that download is starting
+            await PromptServer.instance.send("server_download_progress", {
+                "download_id": download_id,
+                "progress": 0,
+                "downloaded": 0,
+                "total": 0
+            })
 
-            return len(chunk_data)
-    except Exception as e:
-        logging.error(f"[ComfyUI-Downloader] Error downloading chunk {chunk_index} for {download_id}: {e}")
-        return None
+            await download_file(url, output_path, download_id)
+            logging.info(f"[ComfyUI-Downloader] Download completed: {download_id}, processing next in queue...")
+        except Exception as e:
+            logging.error(f"[ComfyUI-Downloader] Error processing download queue: {e}")
+        finally:
+            download_queue.task_done()
 
 
 async def download_file(url, output_path, download_id):
     """Download file with multi-connection support and progress tracking"""
-    import aiohttp
-
     logging.info(f"[ComfyUI-Downloader] Download {download_id} using {NUM_CONNECTIONS} connections")
 
+    # Keep local references - cancel_download removes both entries while connections may still be running
+    state = active_downloads[download_id]
+    resume_event = asyncio.Event()
+    resume_event.set()
+    control = {
+        "resume_event": resume_event,  # Cleared while paused, set while running
+        "cancelled": False,
+        "last_progress_time": _monotonic(),
+        # Hot progress counters updated per received chunk: array('Q', [downloaded, total, progress * 100]).
+        # Only report_progress copies them into active_downloads
+        "counters": array('Q', [0, 0, 0]),
+        "completed_ranges": [],  # Finished slices, persisted to the .ranges sidecar
+        "ranges_lock": asyncio.Lock()
+    }
+
     try:
         # Initialize control for this download
-        import time
-        download_control[download_id] = {
-            "paused": False,
-            "cancelled": False,
-            "total_downloaded": 0,
-            "last_progress_time": time.time(),
-            "last_report_time": 0,  # Shared timestamp for throttling progress updates
-            "lock": asyncio.Lock()
-        }
+        download_control[download_id] = control
 
-        timeout = aiohttp.ClientTimeout(total=None)
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            # Get file size - try HEAD first, then fall back to GET with Range
+        session = await get_session()
+
+        # Get file size from the first real range request - no separate HEAD/probe round trip.
+        # The body of that response is the first slice of the download
+        first_response = await session.get(url, headers={'Range': f'bytes=0-{SLICE_SIZE - 1}'})
+        try:
             total_size = 0
             supports_range = False
 
-            try:
-                # Try HEAD request first
-                async with session.head(url, allow_redirects=True) as response:
-                    if response.status == 200:
-                        total_size = int(response.headers.get('content-length', 0))
-                        supports_range = response.headers.get('accept-ranges') == 'bytes'
-            except Exception as e:
-                logging.warning(f"[ComfyUI-Downloader] HEAD request failed for {download_id}: {e}")
-
-            # If HEAD didn't give us the size, try GET with Range header
-            if total_size == 0:
-                logging.info(f"[ComfyUI-Downloader] HEAD request didn't return size, trying GET with Range for {download_id}")
-                try:
-                    headers = {'Range': 'bytes=0-0'}
-                    async with session.get(url, headers=headers, allow_redirects=True) as response:
-                        if response.status in [200, 206]:
-                            # Try to get size from Content-Range header first
-                            content_range = response.headers.get('content-range', '')
-                            if content_range:
-                                parts = content_range.split('/')
-                                if len(parts) == 2:
-                                    total_size = int(parts[1])
-                                    supports_range = True
-
-                            # Fallback to Content-Length
-                            if total_size == 0:
-                                total_size = int(response.headers.get('content-length', 0))
-                except Exception as e:
-                    logging.warning(f"[ComfyUI-Downloader] GET with Range failed for {download_id}: {e}")
-
-            if total_size == 0:
-                raise Exception("Could not determine file size from server")
+            if first_response.status == 206:
+                # Content-Range: bytes 0-N/total
+                content_range_header = first_response.headers.get('content-range', '')
+                content_range = parse_content_range(content_range_header)
+                if content_range is None or content_range[0] != 0:
+                    raise Exception(f"Invalid Content-Range for the first slice: {content_range_header!r}")
+
+                if content_range[2] is None:
+                    # Length unknown (bytes 0-N/*) - the file can't be sliced, so fetch it whole
+                    first_response.release()
+                    first_response = await session.get(url)
+                    if first_response.status != 200:
+                        raise Exception(f"HTTP {first_response.status}")
+                    total_size = int(first_response.headers.get('content-length', 0))
+                else:
+                    total_size = content_range[2]
+                    supports_range = True
+            elif first_response.status == 200:
+                # Server ignored the Range header - the response is the whole file
+                total_size = int(first_response.headers.get('content-length', 0))
+            else:
+                raise Exception(f"HTTP {first_response.status}")
 
+            # A total of 0 means the size is unknown - only possible on the single connection path
             logging.info(f"[ComfyUI-Downloader] File size for {download_id}: {total_size} bytes, supports range: {supports_range}")
 
-            # Create file with full size
-            with open(output_path, 'wb') as f:
-                f.seek(total_size - 1)
-                f.write(b'\0')
+            # Pick up the slices an interrupted attempt already finished
+            completed = load_completed_ranges(output_path, url, total_size) if supports_range else set()
+            control["completed_ranges"] = sorted(completed)
+            resumed_bytes = sum(end - start + 1 for start, end in completed)
 
-            active_downloads[download_id]["total"] = total_size
-            active_downloads[download_id]["downloaded"] = 0
+            state["total"] = total_size
+            state["downloaded"] = resumed_bytes
+            counters = control["counters"]
+            counters[0] = resumed_bytes
+            counters[1] = total_size
 
-            # Use multi-connection download if server supports range requests
-            if supports_range and total_size > CHUNK_SIZE:
-                logging.info(f"[ComfyUI-Downloader] Using {NUM_CONNECTIONS} connections for {download_id}")
+            if completed:
+                logging.info(f"[ComfyUI-Downloader] Resuming {download_id}: {resumed_bytes} bytes already downloaded")
+            else:
+                remove_completed_ranges(output_path)
 
-                # Calculate chunk ranges
-                chunk_size = total_size // NUM_CONNECTIONS
-                tasks = []
+            # Single fd shared by all connections - each writes at its own offset
+            flags = os.O_WRONLY | os.O_CREAT | getattr(os, "O_BINARY", 0)
+            fd = os.open(output_path, flags if completed else flags | os.O_TRUNC, 0o644)
+            progress_task = asyncio.create_task(report_progress(download_id, control, total_size))
+            try:
+                # Create file with full size - off the event loop, as fallocate can write every block
+                if not completed and total_size:
+                    await asyncio.get_running_loop().run_in_executor(_io_executor, preallocate, fd, total_size)
+                    # Allocating a large file can take seconds - that is not a network stall
+                    control["last_progress_time"] = _monotonic()
+
+                if supports_range:
+                    # Split the file into slices - the first one streams from the response we already have
+                    slices = asyncio.Queue()
+                    for start in range(0, total_size, SLICE_SIZE):
+                        end = min(start + SLICE_SIZE, total_size) - 1
+                        if (start, end) not in completed:
+                            slices.put_nowait((start, end, first_response if start == 0 else None))
+                        elif start == 0:
+                            # Already on disk - give the probe's connection back instead of holding it unread
+                            first_response.release()
+
+                    # Small files don't pay for connections they can't keep busy
+                    num_connections = min(NUM_CONNECTIONS, max(1, total_size // SLICE_SIZE))
+                    logging.info(f"[ComfyUI-Downloader] Using {num_connections} connections for {download_id}")
+
+                    tasks = [
+                        download_slices(session, url, fd, i, download_id, control, slices, output_path, total_size)
+                        for i in range(num_connections)
+                    ]
+
+                    # Download all slices in parallel
+                    results = await asyncio.gather(*tasks, return_exceptions=True)
+
+                    # Check for errors - keep the finished slices so a retry can resume
+                    for result in results:
+                        if isinstance(result, Exception):
+                            await flush_completed_ranges(control, fd, output_path, url, total_size)
+                            raise result
 
-                for i in range(NUM_CONNECTIONS):
-                    start = i * chunk_size
-                    end = start + chunk_size - 1 if i < NUM_CONNECTIONS - 1 else total_size - 1
+                else:
+                    # Fallback to single connection download
+                    logging.info(f"[ComfyUI-Downloader] Using single connection for {download_id}")
+                    await download_single_connection(first_response, fd, download_id, control)
+            finally:
+                progress_task.cancel()
+                os.close(fd)
+        finally:
+            first_response.release()
+
+        # Check if cancelled
+        if control["cancelled"]:
+            os.remove(output_path)
+            remove_completed_ranges(output_path)
+            return
+
+        remove_completed_ranges(output_path)
+
+        # Mark as complete - the reporter was cancelled, so copy the final count ourselves
+        state["downloaded"] = counters[0]
+        state["status"] = "completed"
+        state["progress"] = 100
+
+        # Send completion message
+        await PromptServer.instance.send("server_download_complete", {
+            "download_id": download_id,
+            "path": output_path,
+            "size": total_size or counters[0]
+        })
 
-                    tasks.append(download_chunk_with_progress(
-                        session, url, start, end, output_path, i, download_id, total_size
-                    ))
+        logging.info(f"[ComfyUI-Downloader] Successfully downloaded {download_id} to {output_path}")
 
-                # Download all chunks in parallel
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+        # Cleanup
+        if download_control.get(download_id) is control:
+            del download_control[download_id]
 
-                # Check for errors
-                for result in results:
-                    if isinstance(result, Exception):
-                        raise result
+    except Exception as e:
+        # Cancelled by the user (already reported by cancel_download) - don't leave a
+        # partial file behind to be resumed later
+        if active_downloads.get(download_id) is not state:
+            logging.info(f"[ComfyUI-Downloader] Download {download_id} cancelled: {e}")
+            for path in (output_path, ranges_path(output_path)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        else:
+            logging.error(f"[ComfyUI-Downloader] Error downloading {download_id}: {e}")
+            state["status"] = "error"
+            state["error"] = str(e)
+
+            await PromptServer.instance.send("server_download_error", {
+                "download_id": download_id,
+                "error": str(e)
+            })
 
-            else:
-                # Fallback to single connection download
-                logging.info(f"[ComfyUI-Downloader] Using single connection for {download_id}")
-                await download_single_connection(session, url, output_path, download_id, total_size)
+        # Cleanup
+        if download_control.get(download_id) is control:
+            del download_control[download_id]
 
-            # Check if cancelled
-            if download_control[download_id]["cancelled"]:
-                os.remove(output_path)
-                return
 
-            # Mark as complete
-            active_downloads[download_id]["status"] = "completed"
-            active_downloads[download_id]["progress"] = 100
+async def report_progress(download_id, control, total_size):
+    """Send one progress update per 100ms for a download, shared across all connections"""
+    counters = control["counters"]
+    last_sent = None
 
-            # Send completion message
-            await PromptServer.instance.send("server_download_complete", {
-                "download_id": download_id,
-                "path": output_path,
-                "size": total_size
-            })
+    while True:
+        await asyncio.sleep(0.1)
 
-            logging.info(f"[ComfyUI-Downloader] Successfully downloaded {download_id} to {output_path}")
+        state = active_downloads.get(download_id)
+        if state is None:
+            return  # Cancelled and removed
 
-            # Cleanup
-            del download_control[download_id]
+        # Nothing new to report (paused, stalled or slow link) - skip the JSON message
+        total_downloaded = counters[0]
+        if total_downloaded == last_sent:
+            continue
+        last_sent = total_downloaded
 
-    except Exception as e:
-        logging.error(f"[ComfyUI-Downloader] Error downloading {download_id}: {e}")
-        active_downloads[download_id]["status"] = "error"
-        active_downloads[download_id]["error"] = str(e)
+        counters[2] = total_downloaded * 10000 // total_size if total_size else 0
+        progress = counters[2] / 100
+        state["progress"] = progress
+        state["downloaded"] = total_downloaded
 
-        await PromptServer.instance.send("server_download_error", {
+        await PromptServer.instance.send("server_download_progress", {
             "download_id": download_id,
-            "error": str(e)
+            "progress": progress,
+            "downloaded": total_downloaded,
+            "total": total_size
         })
 
-        # Cleanup
-        if download_id in download_control:
-            del download_control[download_id]
 
+async def download_slices(session, url, fd, chunk_index, download_id, control, slices, output_path, total_size):
+    """Connection worker - downloads slices from the queue until it is empty"""
+    while not slices.empty():
+        start, end, response = slices.get_nowait()
+        await download_chunk_with_progress(session, url, start, end, fd, chunk_index, download_id, control, response)
 
-async def download_chunk_with_progress(session, url, start, end, output_path, chunk_index, download_id, total_size):
-    """Download chunk with progress tracking"""
-    headers = {'Range': f'bytes={start}-{end}'}
-    chunk_size = end - start + 1
-    downloaded = 0
-    last_report_time = 0
+        if control["cancelled"]:
+            return
 
-    try:
-        async with session.get(url, headers=headers) as response:
-            if response.status not in [200, 206]:
-                raise Exception(f"HTTP {response.status} for chunk {chunk_index}")
-
-            with open(output_path, 'r+b') as f:
-                f.seek(start)
-
-                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
-                    # Check if paused
-                    while download_control.get(download_id, {}).get("paused", False):
-                        await asyncio.sleep(0.5)
-
-                    # Check if cancelled
-                    if download_control.get(download_id, {}).get("cancelled", False):
-                        return
-
-                    # Check for stalled download (no progress for 10 seconds)
-                    import time
-                    current_time = time.time()
-                    if current_time - download_control[download_id]["last_progress_time"] > 10:
-                        logging.error(f"[ComfyUI-Downloader] Download stalled for {download_id} - no progress for 10 seconds")
-                        download_control[download_id]["cancelled"] = True
-                        raise Exception("Download stalled - no progress for 10 seconds")
-
-                    f.write(chunk)
-                    chunk_len = len(chunk)
-                    downloaded += chunk_len
-
-                    # Update shared progress counter with lock
-                    async with download_control[download_id]["lock"]:
-                        download_control[download_id]["total_downloaded"] += chunk_len
-                        download_control[download_id]["last_progress_time"] = time.time()
-                        total_downloaded = download_control[download_id]["total_downloaded"]
-                        
-                        # Send progress updates every 100ms to avoid spam (shared across all chunks)
-                        current_time = time.time()
-                        if (current_time - download_control[download_id]["last_report_time"]) >= 0.1:
-                            download_control[download_id]["last_report_time"] = current_time
-                            
-                            progress = round((total_downloaded / total_size) * 100, 2)
-                            active_downloads[download_id]["progress"] = progress
-                            active_downloads[download_id]["downloaded"] = total_downloaded
-
-                            await PromptServer.instance.send("server_download_progress", {
-                                "download_id": download_id,
-                                "progress": progress,
-                                "downloaded": total_downloaded,
-                                "total": total_size
-                            })
+        # Record the finished slice, persisting every few so a crash loses little work
+        completed_ranges = control["completed_ranges"]
+        completed_ranges.append((start, end))
+        if len(completed_ranges) % RANGES_SAVE_INTERVAL == 0:
+            await flush_completed_ranges(control, fd, output_path, url, total_size)
 
-    except Exception as e:
-        logging.error(f"[ComfyUI-Downloader] Error in chunk {chunk_index} for {download_id}: {e}")
-        raise
 
+async def download_chunk_with_progress(session, url, start, end, fd, chunk_index, download_id, control, response=None):
+    """Download chunk with progress tracking, retrying failed attempts from the last byte written"""
+    offset = start  # Next byte to write to disk
+    filled = 0  # Bytes received into buf but not yet written
+    buf = acquire_buffer()
+    counters = control["counters"]
+    resume_event = control["resume_event"]
 
-async def download_single_connection(session, url, output_path, download_id, total_size):
-    """Fallback single connection download"""
-    downloaded_size = 0
+    try:
+        for attempt in range(1, MAX_SLICE_RETRIES + 1):
+            try:
+                if response is None:
+                    response = await session.get(url, headers={'Range': f'bytes={offset}-{end}'})
+
+                async with response:
+                    # Anything but a partial response would write the wrong bytes at this offset
+                    if response.status != 206:
+                        raise Exception(f"HTTP {response.status} for chunk {chunk_index}")
+                    content_range_header = response.headers.get('content-range', '')
+                    content_range = parse_content_range(content_range_header)
+                    if content_range is None or content_range[0] != offset:
+                        raise Exception(f"Content-Range {content_range_header!r} does not start at {offset} for chunk {chunk_index}")
+
+                    async for chunk in response.content.iter_any():
+                        # Wait here while paused
+                        if not resume_event.is_set():
+                            await resume_event.wait()
+                            control["last_progress_time"] = _monotonic()  # Time spent paused is not a stall
+
+                        # Check if cancelled
+                        if control["cancelled"]:
+                            return
+
+                        # Check for stalled download (no progress for 10 seconds)
+                        current_time = _monotonic()
+                        if current_time - control["last_progress_time"] > 10:
+                            logging.error(f"[ComfyUI-Downloader] Download stalled for {download_id} - no progress for 10 seconds")
+                            control["cancelled"] = True
+                            raise Exception("Download stalled - no progress for 10 seconds")
+
+                        filled, offset = await buffered_write(fd, buf, filled, offset, chunk)
+
+                        # Update the shared counter - no lock needed, there is no await between read and write
+                        counters[0] += len(chunk)
+                        control["last_progress_time"] = _monotonic()
+
+                offset = await flush_buffer(fd, buf, filled, offset)
+                filled = 0
+                if offset <= end:
+                    raise Exception(f"Connection closed after {offset - start} of {end - start + 1} bytes")
+                return
 
-    async with session.get(url) as response:
-        if response.status != 200:
-            raise Exception(f"HTTP {response.status}")
+            except Exception as e:
+                if control["cancelled"] or attempt == MAX_SLICE_RETRIES:
+                    logging.error(f"[ComfyUI-Downloader] Error in chunk {chunk_index} for {download_id}: {e}")
+                    raise
+
+                # Keep what was already received so the retry continues after it
+                offset = await flush_buffer(fd, buf, filled, offset)
+                filled = 0
+
+                logging.warning(f"[ComfyUI-Downloader] Retrying bytes {offset}-{end} for {download_id} ({attempt}/{MAX_SLICE_RETRIES}): {e}")
+                response = None
+                await asyncio.sleep(1)
+                control["last_progress_time"] = _monotonic()
+    finally:
+        release_buffer(buf)
+
+
+async def download_single_connection(response, fd, download_id, control):
+    """Fallback single connection download from a full (non-range) response"""
+    offset = 0
+    filled = 0
+    buf = acquire_buffer()
+    counters = control["counters"]
+    resume_event = control["resume_event"]
 
-        with open(output_path, 'wb') as f:
-            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
-                # Check if paused
-                while download_control.get(download_id, {}).get("paused", False):
-                    await asyncio.sleep(0.5)
+    try:
+        async with response:
+            async for chunk in response.content.iter_any():
+                # Wait here while paused
+                if not resume_event.is_set():
+                    await resume_event.wait()
+                    control["last_progress_time"] = _monotonic()  # Time spent paused is not a stall
 
                 # Check if cancelled
-                if download_control.get(download_id, {}).get("cancelled", False):
+                if control["cancelled"]:
                     return
 
                 # Check for stalled download (no progress for 10 seconds)
-                import time
-                current_time = time.time()
-                if current_time - download_control[download_id]["last_progress_time"] > 10:
+                current_time = _monotonic()
+                if current_time - control["last_progress_time"] > 10:
                     logging.error(f"[ComfyUI-Downloader] Download stalled for {download_id} - no progress for 10 seconds")
-                    download_control[download_id]["cancelled"] = True
+                    control["cancelled"] = True
                     raise Exception("Download stalled - no progress for 10 seconds")
 
-                f.write(chunk)
-                downloaded_size += len(chunk)
-                download_control[download_id]["last_progress_time"] = time.time()
+                filled, offset = await buffered_write(fd, buf, filled, offset, chunk)
 
-                # Update progress
-                progress = round((downloaded_size / total_size) * 100, 2)
-                active_downloads[download_id]["progress"] = progress
-                active_downloads[download_id]["downloaded"] = downloaded_size
+                # Progress is reported by report_progress from the shared counters
+                counters[0] += len(chunk)
+                control["last_progress_time"] = _monotonic()
 
-                await PromptServer.instance.send("server_download_progress", {
-                    "download_id": download_id,
-                    "progress": progress,
-                    "downloaded": downloaded_size,
-                    "total": total_size
-                })
+        await flush_buffer(fd, buf, filled, offset)
+    finally:
+        release_buffer(buf)
 
 
 @PromptServer.instance.routes.get(f"/{API_PREFIX}/server_download/status")
@@ -516,8 +815,6 @@ async def get_single_download_status(request):
 @PromptServer.instance.routes.post(f"/{API_PREFIX}/server_download/cancel")
 async def cancel_download(request):
     """Cancel an active download"""
-    global download_queue, current_download_task
-
     try:
         json_data = await request.json()
         download_id = json_data.get("download_id")
@@ -528,13 +825,15 @@ async def cancel_download(request):
                 status=400
             )
 
-        # Check if download is queued (not started yet)
-        was_queued = any(d["download_id"] == download_id for d in download_queue)
-        download_queue[:] = [d for d in download_queue if d["download_id"] != download_id]
+        # Check if download is queued (not started yet) - the worker skips it once it is
+        # removed from active_downloads below
+        was_queued = active_downloads.get(download_id, {}).get("status") == "queued"
 
         # Check if download is active
         if download_id in download_control:
             download_control[download_id]["cancelled"] = True
+            # Wake connections waiting while paused so they see the cancellation
+            download_control[download_id]["resume_event"].set()
             # Give it a moment to detect cancellation and cleanup
             await asyncio.sleep(0.1)
 
@@ -583,15 +882,10 @@ async def get_supported_extensions(request):
 async def get_folder_names(request):
     """Get available folder names from folder_paths"""
     try:
-        # Only return folders that have valid paths (non-empty paths list)
-        folder_names = []
-        for folder_name, (paths, _) in folder_paths.folder_names_and_paths.items():
-            if paths and any("/models/" in path for path in paths):  # Check if paths list is not empty and contains /models/
-                folder_names.append(folder_name)
-        
+        # Only return folders that have valid paths (containing /models/)
         return web.json_response({
             "success": True,
-            "folders": sorted(folder_names)
+            "folders": sorted(name for name in folder_paths.folder_names_and_paths if _model_paths(name))
         })
     except Exception as e:
         logging.error(f"[ComfyUI-Downloader] Error getting folder names: {e}")
@@ -601,13 +895,12 @@ async def get_folder_names(request):
         )
 
 
-# Add route to serve CSS
-@PromptServer.instance.routes.get(f"/{API_PREFIX}/extensions/ComfyUI-Downloader/css/downloader.css")
-async def get_css(request):
-    css_path = os.path.join(os.path.dirname(__file__), "web", "css", "downloader.css")
-    with open(css_path, "r", encoding="utf-8") as f:
-        css_content = f.read()
-    return web.Response(text=css_content, content_type="text/css")
+# Serve web assets (CSS) as a static route - aiohttp streams them with sendfile
+PromptServer.instance.app.router.add_static(
+    f"/{API_PREFIX}/extensions/ComfyUI-Downloader/",
+    path=os.path.join(os.path.dirname(__file__), "web"),
+    show_index=False
+)
 
 
 # Set the web directory for frontend files